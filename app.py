@@ -1,8 +1,16 @@
 from flask_cors import CORS
 import contextlib
+import glob
 import os
 import io
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import uuid
 from flask import Flask, request, jsonify, send_from_directory
+from werkzeug.exceptions import HTTPException
 
 # Import your existing solver functions
 from data_loader import load_cvrp_instance
@@ -17,19 +25,146 @@ from visualizer import plot_solution
 STATIC_DIR = os.path.join(os.path.dirname(__file__), 'static')
 if not os.path.exists(STATIC_DIR):
     os.makedirs(STATIC_DIR)
+# Images generated by /solve go in their own folder, so pruning never
+# touches the files that ship with the app
+SOLUTIONS_DIR = os.path.join(STATIC_DIR, 'solutions')
+if not os.path.exists(SOLUTIONS_DIR):
+    os.makedirs(SOLUTIONS_DIR)
+
+# --- Admission Control ---
+# These keep a burst of requests from exhausting memory, CPU or disk.
+# Each one can be overridden with an environment variable.
+MAX_REQUEST_BYTES = int(os.environ.get('CVRP_MAX_REQUEST_BYTES', 1024 * 1024))
+MAX_CUSTOMERS = int(os.environ.get('CVRP_MAX_CUSTOMERS', 200))
+MAX_ITERATIONS = int(os.environ.get('CVRP_MAX_ITERATIONS', 1000))
+# Solves running at the same time, in total and per client address
+MAX_CONCURRENT_SOLVES = int(os.environ.get('CVRP_MAX_CONCURRENT_SOLVES', 4))
+MAX_CONCURRENT_PER_CLIENT = int(os.environ.get('CVRP_MAX_CONCURRENT_PER_CLIENT', 2))
+# Only the newest solution images are kept in 'static/solutions'
+MAX_STATIC_IMAGES = int(os.environ.get('CVRP_MAX_STATIC_IMAGES', 50))
+
+solve_slots = threading.BoundedSemaphore(MAX_CONCURRENT_SOLVES)
+client_lock = threading.Lock()
+active_per_client = {}
+# Matplotlib's pyplot keeps global state, so only one plot at a time
+plot_lock = threading.Lock()
 
 # Tell Flask where to serve images from
 app = Flask(__name__, static_folder=STATIC_DIR)
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
 CORS(app) # Allow browser to access this server
 
+# --- Per-Request Log Capture ---
+# contextlib.redirect_stdout swaps sys.stdout for the whole process, so two
+# requests running at the same time would write into each other's log.
+# Instead, the first capture installs one stdout that sends each thread's
+# prints to its own buffer (or to the real stdout when no request is
+# capturing). Importing this module leaves sys.stdout alone.
+class ThreadLocalStdout:
+    def __init__(self):
+        self.default = None
+        self.local = threading.local()
+        self.install_lock = threading.Lock()
+
+    def _stream(self):
+        return getattr(self.local, 'stream', None) or self.default
+
+    def write(self, text):
+        return self._stream().write(text)
+
+    def flush(self):
+        self._stream().flush()
+
+    def __getattr__(self, name):
+        # encoding, isatty, fileno, ... come from the real stdout
+        return getattr(self.default, name)
+
+    def install(self):
+        with self.install_lock:
+            if sys.stdout is not self:
+                self.default = sys.stdout
+                sys.stdout = self
+
+    @contextlib.contextmanager
+    def capture(self, stream):
+        self.install()
+        self.local.stream = stream
+        try:
+            yield stream
+        finally:
+            self.local.stream = None
+
+thread_stdout = ThreadLocalStdout()
+
+def try_acquire_client_slot(client):
+    """
+    Reserves one of the client's concurrent solve slots.
+    Returns False if the client is already at its limit.
+    """
+    with client_lock:
+        active = active_per_client.get(client, 0)
+        if active >= MAX_CONCURRENT_PER_CLIENT:
+            return False
+        active_per_client[client] = active + 1
+        return True
+
+def release_client_slot(client):
+    with client_lock:
+        active = active_per_client.get(client, 0) - 1
+        if active > 0:
+            active_per_client[client] = active
+        else:
+            active_per_client.pop(client, None)
+
+def read_dimension(file_content):
+    """
+    Returns the largest DIMENSION value in the instance header, or None.
+    data_loader allocates its lists and distance matrix from this value,
+    so it has to be checked before the file is loaded.
+    """
+    dimension = None
+    for line in file_content.splitlines():
+        if "DIMENSION" in line:
+            match = re.search(r'\d+', line)
+            if match:
+                dimension = max(dimension or 0, int(match.group()))
+    return dimension
+
+def prune_static_images(keep=MAX_STATIC_IMAGES):
+    """
+    Deletes the oldest generated solution images so that at most
+    'keep' of them stay in the solutions folder.
+    """
+    images = glob.glob(os.path.join(SOLUTIONS_DIR, '*.png'))
+    images.sort(key=os.path.getmtime, reverse=True)
+    for old_image in images[keep:]:
+        try:
+            os.remove(old_image)
+        except OSError:
+            pass # Already removed by another request
+
 # --- Main Solver Route ---
 @app.route('/solve', methods=['POST'])
 def solve_cvrp():
+    # --- 0. Admission Control ---
+    if request.content_length is not None and request.content_length > MAX_REQUEST_BYTES:
+        return jsonify({"error": f"Request too large (limit is {MAX_REQUEST_BYTES} bytes)."}), 413
+
+    client = request.remote_addr or 'unknown'
+    if not try_acquire_client_slot(client):
+        return jsonify({"error": "Too many concurrent requests from this client."}), 429
+
+    if not solve_slots.acquire(blocking=False):
+        release_client_slot(client)
+        return jsonify({"error": "Server is busy, please retry later."}), 503
+
+    temp_dir = None
     try:
         # --- 1. Get Data from Frontend ---
         data = request.json
         file_content = data.get('fileContent')
-        file_name = data.get('fileName', 'instance.vrp')
+        # Only keep the base name, the client must not choose where we write
+        file_name = os.path.basename(data.get('fileName') or 'instance.vrp')
         
         # Get parameters
         iterations = int(data.get('iterations', 200))
@@ -37,24 +172,53 @@ def solve_cvrp():
 
         if not file_content:
             return jsonify({"error": "No file content provided."}), 400
+        if not 0 < iterations <= MAX_ITERATIONS:
+            return jsonify({"error": f"iterations must be between 1 and {MAX_ITERATIONS}."}), 400
+        if tenure < 1:
+            return jsonify({"error": "tenure must be at least 1."}), 400
+        # DIMENSION counts the depot too
+        dimension = read_dimension(file_content)
+        if dimension is not None and dimension > MAX_CUSTOMERS + 1:
+            return jsonify({"error": f"Instance too large (limit is {MAX_CUSTOMERS} customers)."}), 413
 
         # --- 2. Save Temp File to Feed to Your functions ---
         # Your data_loader expects a filepath, so we give it one.
-        temp_filepath = os.path.join(os.path.dirname(__file__), file_name)
+        # Each request gets its own directory so concurrent uploads
+        # with the same file name don't overwrite each other.
+        temp_dir = tempfile.mkdtemp(prefix='cvrp_')
+        temp_filepath = os.path.join(temp_dir, file_name)
         with open(temp_filepath, 'w') as f:
             f.write(file_content)
 
         # --- 3. Run Your Solver ---
         # We capture all 'print()' statements to send to the frontend log
         log_stream = io.StringIO()
-        with contextlib.redirect_stdout(log_stream):
+        with thread_stdout.capture(log_stream):
             
             print(f"Loading instance from {file_name}...")
             depot, customers, m, Q, dist_matrix = load_cvrp_instance(temp_filepath)
             print(f"Loaded {len(customers)} customers, {m} vehicles, capacity {Q}.")
 
+            # The vehicle count comes from '-kN' in the file name (1 if missing).
+            # Each vehicle is a route, so it is capped like the customers.
+            if m > MAX_CUSTOMERS:
+                return jsonify({"error": f"Too many vehicles (limit is {MAX_CUSTOMERS})."}), 413
+            # Instances that can't fit into m vehicles would never finish
+            # the initial solution, so reject them before solving
+            if m < 1:
+                return jsonify({"error": "The file name must give at least one vehicle (-kN)."}), 400
+            if any(c.demand > Q for c in customers):
+                return jsonify({"error": f"A customer's demand is above the vehicle capacity {Q}."}), 400
+            if sum(c.demand for c in customers) > m * Q:
+                return jsonify({"error": f"Total demand does not fit into {m} vehicles "
+                                         f"of capacity {Q}."}), 400
+
             print("\nCreating initial solution...")
-            initial_solution = create_initial_solution(depot, customers, m, Q)
+            try:
+                initial_solution = create_initial_solution(depot, customers, m, Q)
+            except ValueError as e:
+                # The random assignment kept failing (tight bin packing)
+                return jsonify({"error": str(e)}), 400
             initial_cost = calculate_solution_cost(initial_solution, dist_matrix)
             print(f"Initial Cost: {initial_cost:.2f}")
 
@@ -76,32 +240,46 @@ def solve_cvrp():
             print(f"\nTotal Improvement: {initial_cost - ts_cost:.2f}")
             
             # --- 4. Generate Plot ---
-            # This will save the image to the 'backend/static' folder
+            # This will save the image to the 'backend/static/solutions' folder.
+            # The random suffix keeps concurrent requests for the same
+            # file name from overwriting each other's image.
             print("\nGenerating plot...")
-            plot_solution(ts_solution, instance_name=file_name)
+            base_name = os.path.splitext(file_name)[0]
+            image_name = f"{base_name}_{uuid.uuid4().hex[:12]}.png"
+            with plot_lock:
+                plot_solution(ts_solution, instance_name=file_name,
+                              save_path=os.path.join(SOLUTIONS_DIR, image_name))
+                prune_static_images()
 
         # Get the captured log text
         log_output = log_stream.getvalue()
         
-        # --- 5. Clean up temp file and prepare response ---
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-            
+        # --- 5. Prepare response ---
         # Create the URL for the image
-        base_name = os.path.splitext(file_name)[0]
-        image_name = f"{base_name}_solution.png"
-        # The URL will be like: http://127.0.0.1:5000/static/E-n23-k3_solution.png
-        image_url = f"/static/{image_name}"
+        # The URL will be like: http://127.0.0.1:5000/static/solutions/E-n23-k3_1a2b3c4d5e6f.png
+        image_url = f"/static/solutions/{image_name}"
 
         return jsonify({
             "log": log_output,
+            "image_name": image_name,
             "image_url": image_url
         })
 
+    except HTTPException as e:
+        # e.g. a body over MAX_CONTENT_LENGTH or invalid JSON
+        return jsonify({"error": e.description}), e.code
+
     except Exception as e:
         # Send any Python errors back to the browser
         return jsonify({"error": str(e)}), 500
 
+    finally:
+        # --- 6. Clean up temp file and release the slots ---
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        solve_slots.release()
+        release_client_slot(client)
+
 # This lets you serve the images (e.g., /static/solution.png)
 @app.route('/static/<path:filename>')
 def serve_static(filename):
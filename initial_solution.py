@@ -1,16 +1,16 @@
 import random
 
-def create_initial_solution(depot, customers, num_vehicles, vehicle_capacity):
+def create_initial_solution(depot, customers, num_vehicles, vehicle_capacity,
+                            max_attempts=1000):
     """
     Implements the Initial_Solution() algorithm from the paper.
     It randomly assigns customers to routes, respecting capacity.
     [cite_start][cite: 144-161]
+    Raises ValueError if no random assignment fits into num_vehicles
+    routes within max_attempts tries.
     """
     
-    solution = []
-    unassigned_customers = list(customers)
-    
-    while unassigned_customers:
+    for _ in range(max_attempts):
         solution = []
         unassigned_customers = list(customers)
         random.shuffle(unassigned_customers)
@@ -31,7 +31,9 @@ def create_initial_solution(depot, customers, num_vehicles, vehicle_capacity):
             tour.append(depot) # T' <- T' U {d}
             solution.append(tour) # S <- S U {T'}
 
-        if unassigned_customers:
-            pass # The outer 'while' loop will handle the retry
+        if not unassigned_customers:
+            return solution
+        # Otherwise the outer loop retries with a new shuffle
 
-    return solution
\ No newline at end of file
+    raise ValueError(f"Could not fit {len(customers)} customers into {num_vehicles} "
+                     f"vehicles of capacity {vehicle_capacity} after {max_attempts} attempts.")
\ No newline at end of file
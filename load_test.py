@@ -0,0 +1,300 @@
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------------
+# --- LOAD TEST FOR THE FLASK SOLVE SERVICE
+# -------------------------------------------
+# Starts app.py locally, replays a mix of instance sizes against /solve
+# and reports latency percentiles, throughput, memory and disk growth.
+#
+# Example:
+#   python load_test.py --requests 100 --concurrency 8 --sizes 15,30,60
+#
+# All requests come from 127.0.0.1, so the server's per-client cap applies
+# to the whole run. By default both concurrency caps are raised to
+# --concurrency so the run measures latency, not rejections. Pass
+# --max-per-client / --max-solves to test admission control instead;
+# rejected requests show up as 429/503 in the status counts.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SOLUTIONS_DIR = os.path.join(APP_DIR, 'static', 'solutions')
+
+# -------------------------------------------
+# --- INSTANCE GENERATION
+# -------------------------------------------
+
+def generate_instance(num_customers, num_vehicles, seed):
+    """
+    Generates a random CVRP instance in the CVRPLIB format.
+    Returns (file_name, file_content).
+    The capacity leaves some slack so the random initial solution
+    always fits in num_vehicles routes.
+    """
+    rng = random.Random(seed)
+    dimension = num_customers + 1
+    demands = [0] + [rng.randint(1, 30) for _ in range(num_customers)]
+    capacity = math.ceil(sum(demands) / num_vehicles * 1.5)
+    name = f"LT-n{dimension}-k{num_vehicles}"
+
+    lines = [
+        f"NAME : {name}",
+        "TYPE : CVRP",
+        f"DIMENSION : {dimension}",
+        "EDGE_WEIGHT_TYPE : EUC_2D",
+        f"CAPACITY : {capacity}",
+        "NODE_COORD_SECTION",
+    ]
+    for node_id in range(1, dimension + 1):
+        lines.append(f"{node_id} {rng.randint(0, 100)} {rng.randint(0, 100)}")
+    lines.append("DEMAND_SECTION")
+    for node_id in range(1, dimension + 1):
+        lines.append(f"{node_id} {demands[node_id - 1]}")
+    lines += ["DEPOT_SECTION", "1", "-1", "EOF"]
+
+    return f"{name}.vrp", "\n".join(lines) + "\n"
+
+def build_payloads(sizes, iterations, tenure, seed):
+    """
+    Builds one encoded /solve request body per instance size.
+    """
+    payloads = []
+    for i, size in enumerate(sizes):
+        num_vehicles = max(2, size // 10)
+        file_name, file_content = generate_instance(size, num_vehicles, seed + i)
+        body = json.dumps({
+            "fileName": file_name,
+            "fileContent": file_content,
+            "iterations": iterations,
+            "tenure": tenure,
+        }).encode('utf-8')
+        payloads.append((size, body))
+    return payloads
+
+# -------------------------------------------
+# --- MEASUREMENT HELPERS
+# -------------------------------------------
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def read_rss_kb(pid):
+    """
+    Reads the resident memory of a process from /proc (Linux only).
+    Returns None where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def solutions_dir_usage():
+    """
+    Returns (number of files, total bytes) in the folder the server
+    writes its solution images to.
+    """
+    count = 0
+    total = 0
+    if os.path.isdir(SOLUTIONS_DIR):
+        for entry in os.scandir(SOLUTIONS_DIR):
+            if entry.is_file():
+                count += 1
+                total += entry.stat().st_size
+    return count, total
+
+# -------------------------------------------
+# --- SERVER AND CLIENT
+# -------------------------------------------
+
+def start_server(port, env_overrides):
+    """
+    Starts app.py in a subprocess (no debugger, no reloader) and waits
+    until it accepts connections.
+    """
+    env = dict(os.environ)
+    env.update(env_overrides)
+    code = f"from app import app; app.run(port={port}, threaded=True, debug=False)"
+    server = subprocess.Popen([sys.executable, "-c", code], cwd=APP_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup "
+                               "(run 'python app.py' to see the error).")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/static/", timeout=1)
+            return server
+        except urllib.error.HTTPError:
+            return server # Any HTTP answer means it is up
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("Server did not start within 30 seconds.")
+
+def send_request(url, body, timeout):
+    """
+    Sends one /solve request.
+    Returns (status code, latency in seconds, image name or None).
+    """
+    req = urllib.request.Request(url, data=body, method='POST',
+                                 headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    image_name = None
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            image_name = json.loads(response.read()).get('image_name')
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0 # Connection error or timeout
+    return status, time.perf_counter() - start, image_name
+
+# -------------------------------------------
+# --- MAIN
+# -------------------------------------------
+
+def run_load_test(args):
+    sizes = [int(s) for s in args.sizes.split(',')]
+    payloads = build_payloads(sizes, args.iterations, args.tenure, args.seed)
+    rng = random.Random(args.seed)
+    schedule = [rng.choice(payloads) for _ in range(args.requests)]
+
+    # Unless asked otherwise, let every request in flight be admitted
+    max_per_client = args.max_per_client or args.concurrency
+    max_solves = args.max_solves or args.concurrency
+    env_overrides = {
+        'CVRP_MAX_CONCURRENT_PER_CLIENT': str(max_per_client),
+        'CVRP_MAX_CONCURRENT_SOLVES': str(max_solves),
+    }
+    if args.max_images is not None:
+        env_overrides['CVRP_MAX_STATIC_IMAGES'] = str(args.max_images)
+
+    print(f"Starting server on port {args.port}...")
+    server = start_server(args.port, env_overrides)
+    url = f"http://127.0.0.1:{args.port}/solve"
+
+    # Warm up (first plot, thread and allocator setup) so the memory
+    # baseline below only leaves growth caused by sustained load
+    if args.warmup > 0:
+        print(f"Warming up with {args.warmup} requests...")
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda body: send_request(url, body, args.timeout),
+                          [payloads[i % len(payloads)][1] for i in range(args.warmup)]))
+
+    rss_start = read_rss_kb(server.pid)
+    files_start, bytes_start = solutions_dir_usage()
+    rss_peak = rss_start or 0
+
+    # Sample the server's memory in the background
+    stop_sampling = threading.Event()
+    def sample_memory():
+        nonlocal rss_peak
+        while not stop_sampling.wait(0.25):
+            rss = read_rss_kb(server.pid)
+            if rss is not None:
+                rss_peak = max(rss_peak, rss)
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+
+    print(f"Sending {args.requests} requests (concurrency {args.concurrency}, sizes {sizes}, "
+          f"caps {max_per_client} per client / {max_solves} total)...")
+    results = []
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(send_request, url, body, args.timeout)
+                       for _, body in schedule]
+            for (size, _), future in zip(schedule, futures):
+                status, latency, image_name = future.result()
+                results.append((size, status, latency, image_name))
+        elapsed = time.perf_counter() - start
+        rss_end = read_rss_kb(server.pid)
+    finally:
+        stop_sampling.set()
+        sampler.join()
+        server.terminate()
+        server.wait()
+    files_end, bytes_end = solutions_dir_usage()
+
+    # --- Report ---
+    ok_latencies = [latency for _, status, latency, _ in results if status == 200]
+    image_names = [name for _, status, _, name in results if status == 200 and name]
+    status_counts = {}
+    for _, status, _, _ in results:
+        status_counts[status] = status_counts.get(status, 0) + 1
+
+    print("\n--- LOAD TEST RESULTS ---")
+    print(f"Duration:    {elapsed:.2f} s")
+    print(f"Throughput:  {len(ok_latencies) / elapsed:.2f} successful req/s "
+          f"({len(results) / elapsed:.2f} req/s total)")
+    print("Status codes: " + ", ".join(f"{code or 'error'}: {count}"
+                                       for code, count in sorted(status_counts.items())))
+    print(f"Latency (200 only): p50 {percentile(ok_latencies, 50) * 1000:.0f} ms, "
+          f"p95 {percentile(ok_latencies, 95) * 1000:.0f} ms, "
+          f"p99 {percentile(ok_latencies, 99) * 1000:.0f} ms")
+
+    print("Latency by size (p50 / p95 ms):")
+    for size in sizes:
+        latencies = [l for s, status, l, _ in results if s == size and status == 200]
+        if latencies:
+            print(f"  {size:>4} customers: {percentile(latencies, 50) * 1000:.0f} / "
+                  f"{percentile(latencies, 95) * 1000:.0f} ({len(latencies)} requests)")
+
+    if rss_start is not None and rss_end is not None:
+        print(f"Server memory: start {rss_start / 1024:.1f} MB, peak {rss_peak / 1024:.1f} MB, "
+              f"end {rss_end / 1024:.1f} MB (growth {(rss_end - rss_start) / 1024:+.1f} MB)")
+    else:
+        print("Server memory: not available on this platform")
+    # Every successful solve writes one image, so whatever is missing
+    # at the end was pruned by the server
+    images_pruned = files_start + len(image_names) - files_end
+    print(f"Solution images: {len(image_names)} created ({len(set(image_names))} unique names), "
+          f"{images_pruned} pruned")
+    print(f"Solutions folder: {files_start} -> {files_end} files, "
+          f"{bytes_start / 1024:.0f} -> {bytes_end / 1024:.0f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the CVRP solve service.")
+    parser.add_argument('--requests', type=int, default=100, help="Total number of requests")
+    parser.add_argument('--concurrency', type=int, default=4, help="Requests in flight at once")
+    parser.add_argument('--sizes', default='15,30,60', help="Comma-separated customer counts")
+    parser.add_argument('--iterations', type=int, default=100, help="Tabu iterations per request")
+    parser.add_argument('--tenure', type=int, default=10, help="Tabu tenure per request")
+    parser.add_argument('--port', type=int, default=5050, help="Port for the local server")
+    parser.add_argument('--warmup', type=int, default=8,
+                        help="Unmeasured requests sent before the run")
+    parser.add_argument('--timeout', type=float, default=120, help="Per-request timeout (s)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for instances and request mix")
+    parser.add_argument('--max-per-client', type=int, default=None,
+                        help="Server's per-client concurrency cap (default: --concurrency)")
+    parser.add_argument('--max-solves', type=int, default=None,
+                        help="Server's total concurrency cap (default: --concurrency)")
+    parser.add_argument('--max-images', type=int, default=None,
+                        help="Override how many solution images the server keeps")
+    run_load_test(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,153 @@
 import copy
-from utils import calculate_solution_cost, calculate_route_demand
+import math
+import random
+from collections import OrderedDict
+from utils import (calculate_solution_cost, calculate_route_demand,
+                   build_arc_keys, calculate_solution_hash)
 
-def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenure):
+# --- Reactive Tabu Search parameters ---
+# The tenure grows when the best allowed move leads back to a solution we
+# have already visited, and shrinks again after a quiet stretch without
+# revisits. It never drops below the tenure the caller asked for.
+TENURE_INCREASE = 1.1
+TENURE_DECREASE = 0.9
+# If the search actually returns to the same solution this many times, it
+# is stuck in a cycle that a longer tenure did not break, so we kick it
+# with random moves.
+REPEAT_LIMIT = 3
+KICK_MOVES = 3
+# Upper bound on the number of remembered solution hashes
+MAX_VISITED = 10000
+# Debug self-check: recompute the hash and cost from scratch after every
+# move and kick, and compare them with the incremental values. Slow.
+CHECK_INCREMENTAL = False
+
+def _relocation_hash_delta(route_from, c_idx, route_to, insert_pos, arc_keys):
+    """
+    Returns the value to XOR into the solution hash when the customer at
+    route_from[c_idx] is moved to route_to[insert_pos].
+    Only the 6 arcs touched by the move change, so this is O(1).
+    """
+    customer = route_from[c_idx]
+    c_prev = route_from[c_idx - 1]
+    c_next = route_from[c_idx + 1]
+    ins_prev = route_to[insert_pos - 1]
+    ins_next = route_to[insert_pos]
+    
+    # Removing the customer: (prev, c), (c, next) out, (prev, next) in
+    # Inserting the customer: (ins_prev, ins_next) out, (ins_prev, c), (c, ins_next) in
+    return (arc_keys[c_prev.id][customer.id] ^ arc_keys[customer.id][c_next.id] ^
+            arc_keys[c_prev.id][c_next.id] ^
+            arc_keys[ins_prev.id][ins_next.id] ^
+            arc_keys[ins_prev.id][customer.id] ^ arc_keys[customer.id][ins_next.id])
+
+def _relocation_cost_delta(route_from, c_idx, route_to, insert_pos, dist_matrix):
+    """
+    Returns the change in solution cost when the customer at
+    route_from[c_idx] is moved to route_to[insert_pos].
+    """
+    customer = route_from[c_idx]
+    
+    # Cost of removing customer from route 1
+    c_prev = route_from[c_idx - 1]
+    c_next = route_from[c_idx + 1]
+    cost_removed = (dist_matrix[c_prev.id][customer.id] + 
+                    dist_matrix[customer.id][c_next.id] - 
+                    dist_matrix[c_prev.id][c_next.id])
+    
+    # Cost of inserting customer into route 2
+    ins_prev = route_to[insert_pos - 1]
+    ins_next = route_to[insert_pos]
+    cost_added = (dist_matrix[ins_prev.id][customer.id] + 
+                  dist_matrix[customer.id][ins_next.id] - 
+                  dist_matrix[ins_prev.id][ins_next.id])
+    
+    return cost_added - cost_removed
+
+def _apply_relocation(solution, r1_idx, c_idx, r2_idx, insert_pos):
+    """
+    Moves the customer at solution[r1_idx][c_idx] to
+    solution[r2_idx][insert_pos] and returns the moved customer.
+    """
+    customer_to_move = solution[r1_idx].pop(c_idx)
+    
+    if r1_idx == r2_idx:
+        # Handle intra-route move (indices may have shifted)
+        if c_idx < insert_pos:
+            solution[r2_idx].insert(insert_pos - 1, customer_to_move)
+        else:
+            solution[r2_idx].insert(insert_pos, customer_to_move)
+    else:
+        # Inter-route move
+        solution[r2_idx].insert(insert_pos, customer_to_move)
+    
+    return customer_to_move
+
+def _random_kick(solution, vehicle_capacity, dist_matrix, arc_keys, num_moves):
+    """
+    Diversification kick: applies up to num_moves random feasible
+    relocations to the solution.
+    Returns (cost_delta, hash_delta, moved_customer_ids).
+    """
+    cost_delta = 0
+    hash_delta = 0
+    moved_ids = []
+    
+    for _ in range(num_moves):
+        # Collect every feasible relocation, then pick one at random
+        moves = []
+        for r1_idx in range(len(solution)):
+            for c_idx in range(1, len(solution[r1_idx]) - 1):
+                demand = solution[r1_idx][c_idx].demand
+                for r2_idx in range(len(solution)):
+                    if r1_idx != r2_idx:
+                        if calculate_route_demand(solution[r2_idx]) + demand > vehicle_capacity:
+                            continue
+                    for insert_pos in range(1, len(solution[r2_idx])):
+                        if r1_idx == r2_idx and (c_idx == insert_pos or c_idx + 1 == insert_pos):
+                            continue
+                        moves.append((r1_idx, c_idx, r2_idx, insert_pos))
+        
+        if not moves:
+            break
+        
+        (r1_idx, c_idx, r2_idx, insert_pos) = random.choice(moves)
+        cost_delta += _relocation_cost_delta(solution[r1_idx], c_idx, 
+                                             solution[r2_idx], insert_pos, dist_matrix)
+        hash_delta ^= _relocation_hash_delta(solution[r1_idx], c_idx, 
+                                             solution[r2_idx], insert_pos, arc_keys)
+        moved_ids.append(_apply_relocation(solution, r1_idx, c_idx, r2_idx, insert_pos).id)
+    
+    return cost_delta, hash_delta, moved_ids
+
+def _remember_solution(visited, solution_hash, iter_num):
+    """
+    Records a solution in the visited table without counting a revisit,
+    evicting the oldest entry if the table is full.
+    """
+    entry = visited.get(solution_hash)
+    if entry is not None:
+        entry[0] = iter_num
+        visited.move_to_end(solution_hash)
+    else:
+        visited[solution_hash] = [iter_num, 1]
+        if len(visited) > MAX_VISITED:
+            visited.popitem(last=False) # Forget the oldest solution
+
+def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenure,
+                       stats=None):
     """
     Implements the Simple_Tabu_Search(S, iters, tabuTenure) algorithm.
     It uses a relocation neighborhood (moving one customer) and a
     tabu list to avoid cycling.
+    
+    On top of the tabu list, every visited solution is remembered by an
+    incrementally updated hash (see utils.build_arc_keys). When the best
+    allowed move leads back to a visited solution, another move is taken
+    if one is available and the tenure grows (reactive tabu search).
+    The tenure never drops below the caller's tabu_tenure, and a random
+    kick is applied when the search keeps cycling.
+    If a dict is passed as 'stats', the run statistics are stored in it.
     """
     
     # We need to deepcopy, as we'll be modifying the current solution
@@ -21,6 +163,25 @@ def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenu
     # We'll store the customer ID that was moved.
     tabu_list = []
     
+    # Visited-solution table: hash -> [last iteration seen, times seen]
+    # Kept in least-recently-seen order so the oldest entry is evicted first.
+    arc_keys = build_arc_keys(len(dist_matrix) - 1)
+    current_hash = calculate_solution_hash(S_cur, arc_keys)
+    visited = OrderedDict()
+    visited[current_hash] = [-1, 1]
+    
+    # Reactive tenure state
+    # The tenure stays between the caller's value and half the customers,
+    # so there are always enough non-tabu customers left to move.
+    min_tenure = tabu_tenure
+    max_tenure = max(min_tenure, sum(len(route) - 2 for route in S_cur) // 2)
+    last_tenure_change = 0
+    avg_cycle_length = float(tabu_tenure)
+    
+    revisits_detected = 0
+    revisits_avoided = 0
+    kicks = 0
+    
     print(f"Starting Tabu Search. Initial Cost: {best_cost:.2f}")
 
     # Main loop: while iter < iters [cite: 230]
@@ -30,19 +191,42 @@ def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenu
         # We need to find the best move, even if it's non-improving.
         best_move = None
         best_move_delta = float('inf') # M_im / C_im in paper [cite: 214-215]
+        # Best move that leads back to an already visited solution
+        best_revisit_move = None
+        best_revisit_delta = float('inf')
+        best_revisit_hash = None
+        
+        # Route demands don't change while we scan the neighborhood
+        route_demands = [calculate_route_demand(route) for route in S_cur]
         
         # --- 1. Explore the "Relocation" Neighborhood ---
         # Iterate over every route r1
         for r1_idx in range(len(S_cur)):
+            route1 = S_cur[r1_idx]
             # Iterate over every customer in r1 (skip depots)
-            for c_idx in range(1, len(S_cur[r1_idx]) - 1):
+            for c_idx in range(1, len(route1) - 1):
+                
+                customer_to_move = route1[c_idx]
+                is_tabu = customer_to_move.id in tabu_list
                 
-                customer_to_move = S_cur[r1_idx][c_idx]
+                # Cost of removing customer from route 1
+                c_prev = route1[c_idx - 1]
+                c_next = route1[c_idx + 1]
+                cost_removed = (dist_matrix[c_prev.id][customer_to_move.id] + 
+                                dist_matrix[customer_to_move.id][c_next.id] - 
+                                dist_matrix[c_prev.id][c_next.id])
                 
                 # Iterate over every route r2 (can be the same as r1)
                 for r2_idx in range(len(S_cur)):
+                    
+                    # Check Capacity Constraint [cite: 254]
+                    if r1_idx != r2_idx:
+                        if route_demands[r2_idx] + customer_to_move.demand > vehicle_capacity:
+                            continue # Move is not feasible
+                    
+                    route2 = S_cur[r2_idx]
                     # Iterate over every possible insertion position in r2 (skip depot 0)
-                    for insert_pos in range(1, len(S_cur[r2_idx])):
+                    for insert_pos in range(1, len(route2)):
                         
                         # --- 2. Check Feasibility and Calculate Cost Delta ---
                         
@@ -50,32 +234,20 @@ def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenu
                         if r1_idx == r2_idx and (c_idx == insert_pos or c_idx + 1 == insert_pos):
                             continue
                         
-                        # Check Capacity Constraint [cite: 254]
-                        if r1_idx != r2_idx:
-                            if calculate_route_demand(S_cur[r2_idx]) + customer_to_move.demand > vehicle_capacity:
-                                continue # Move is not feasible
-                        
-                        # Calculate cost change (delta)
-                        
-                        # Cost of removing customer from route 1
-                        c_prev = S_cur[r1_idx][c_idx - 1]
-                        c_next = S_cur[r1_idx][c_idx + 1]
-                        cost_removed = (dist_matrix[c_prev.id][customer_to_move.id] + 
-                                        dist_matrix[customer_to_move.id][c_next.id] - 
-                                        dist_matrix[c_prev.id][c_next.id])
-                        
                         # Cost of inserting customer into route 2
-                        ins_prev = S_cur[r2_idx][insert_pos - 1]
-                        ins_next = S_cur[r2_idx][insert_pos]
+                        ins_prev = route2[insert_pos - 1]
+                        ins_next = route2[insert_pos]
                         cost_added = (dist_matrix[ins_prev.id][customer_to_move.id] + 
                                       dist_matrix[customer_to_move.id][ins_next.id] - 
                                       dist_matrix[ins_prev.id][ins_next.id])
                         
                         delta = cost_added - cost_removed
                         
-                        # --- 3. Evaluate Move (Tabu + Aspiration) ---
+                        # Only a move that beats the best one so far matters
+                        if delta >= best_move_delta:
+                            continue
                         
-                        is_tabu = customer_to_move.id in tabu_list
+                        # --- 3. Evaluate Move (Tabu + Aspiration) ---
                         
                         # Aspiration Criterion: [cite: 211]
                         # If this move gives us a new *all-time* best solution
@@ -83,18 +255,42 @@ def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenu
                         
                         if aspiration_met:
                             # This is a great move, take it
-                            if delta < best_move_delta:
-                                best_move = (r1_idx, c_idx, r2_idx, insert_pos)
-                                best_move_delta = delta
+                            # (a new best solution can never have been visited)
+                            best_move = (r1_idx, c_idx, r2_idx, insert_pos)
+                            best_move_delta = delta
                         elif is_tabu:
                             # It's tabu and doesn't meet aspiration, skip it
                             continue
                         else:
-                            # It's not tabu, check if it's the best so far
-                            if delta < best_move_delta:
+                            # Does this move lead back to a visited solution?
+                            new_hash = current_hash ^ _relocation_hash_delta(
+                                route1, c_idx, route2, insert_pos, arc_keys)
+                            
+                            if new_hash in visited:
+                                # Keep it only as a fallback
+                                if delta < best_revisit_delta:
+                                    best_revisit_move = (r1_idx, c_idx, r2_idx, insert_pos)
+                                    best_revisit_delta = delta
+                                    best_revisit_hash = new_hash
+                            else:
+                                # It's not tabu, so it's the best so far
                                 best_move = (r1_idx, c_idx, r2_idx, insert_pos)
                                 best_move_delta = delta
         
+        # --- 3b. Check for Cycling ---
+        # If the best allowed move leads back to a visited solution, the
+        # tabu list is too short to stop the search from cycling. This is
+        # the reactive signal, whether we end up taking that move or not.
+        cycling_entry = None
+        if best_revisit_delta < best_move_delta:
+            cycling_entry = visited[best_revisit_hash]
+            if best_move is not None:
+                revisits_avoided += 1
+            else:
+                # Nothing else is allowed, so take the revisit
+                best_move = best_revisit_move
+                best_move_delta = best_revisit_delta
+        
         # --- 4. Perform the Best Move Found ---
         
         if best_move is None:
@@ -105,25 +301,63 @@ def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenu
         # Unpack the best move
         (r1_idx, c_idx, r2_idx, insert_pos) = best_move
         
-        # Perform the move on S_cur
-        customer_to_move = S_cur[r1_idx].pop(c_idx)
+        # Update the hash before the move changes the routes
+        current_hash ^= _relocation_hash_delta(S_cur[r1_idx], c_idx, 
+                                               S_cur[r2_idx], insert_pos, arc_keys)
         
-        if r1_idx == r2_idx:
-            # Handle intra-route move (indices may have shifted)
-            if c_idx < insert_pos:
-                S_cur[r2_idx].insert(insert_pos - 1, customer_to_move)
-            else:
-                S_cur[r2_idx].insert(insert_pos, customer_to_move)
-        else:
-            # Inter-route move
-            S_cur[r2_idx].insert(insert_pos, customer_to_move)
+        # Perform the move on S_cur
+        customer_to_move = _apply_relocation(S_cur, r1_idx, c_idx, r2_idx, insert_pos)
             
         # Update current cost
         current_cost += best_move_delta
         
         # --- 5. Update Tabu List ---
         tabu_list.append(customer_to_move.id)
-        if len(tabu_list) > tabu_tenure:
+        
+        # --- 5b. React to Cycling ---
+        if cycling_entry is not None:
+            # Grow the tenure
+            cycle_length = iter_num - cycling_entry[0]
+            avg_cycle_length = 0.1 * cycle_length + 0.9 * avg_cycle_length
+            tabu_tenure = min(max_tenure, max(tabu_tenure + 1, 
+                                              math.ceil(tabu_tenure * TENURE_INCREASE)))
+            last_tenure_change = iter_num
+        elif iter_num - last_tenure_change > avg_cycle_length:
+            # No cycling for a while: shrink the tenure again
+            tabu_tenure = max(min_tenure, math.floor(tabu_tenure * TENURE_DECREASE))
+            last_tenure_change = iter_num
+        
+        # --- 5c. Record the New Solution ---
+        entry = visited.get(current_hash)
+        if entry is not None:
+            # The search really is back at a solution it has seen
+            revisits_detected += 1
+            entry[0] = iter_num
+            entry[1] += 1
+            visited.move_to_end(current_hash)
+            
+            if entry[1] >= REPEAT_LIMIT:
+                # It keeps coming back even with a longer tenure:
+                # escape with a few random moves
+                entry[1] = 1
+                kicks += 1
+                kick_cost, kick_hash, kick_ids = _random_kick(S_cur, vehicle_capacity, 
+                                                              dist_matrix, arc_keys, KICK_MOVES)
+                current_cost += kick_cost
+                current_hash ^= kick_hash
+                tabu_list.extend(kick_ids)
+                _remember_solution(visited, current_hash, iter_num)
+                print(f"  Iter {iter_num}: Cycling detected, applied random kick")
+        else:
+            _remember_solution(visited, current_hash, iter_num)
+        
+        if CHECK_INCREMENTAL:
+            assert current_hash == calculate_solution_hash(S_cur, arc_keys), \
+                f"Iter {iter_num}: incremental hash out of sync"
+            assert abs(current_cost - calculate_solution_cost(S_cur, dist_matrix)) < 1e-6, \
+                f"Iter {iter_num}: incremental cost out of sync"
+        
+        while len(tabu_list) > tabu_tenure:
             tabu_list.pop(0) # Remove the oldest item
             
         # --- 6. Update Best Solution Found So Far (S_best) ---
@@ -133,4 +367,30 @@ def simple_tabu_search(solution, vehicle_capacity, dist_matrix, iters, tabu_tenu
             print(f"  Iter {iter_num}: New Best Cost = {best_cost:.2f}")
 
     print(f"Tabu Search Complete. Final Best Cost: {best_cost:.2f}")
-    return S_best
\ No newline at end of file
+    print(f"  Revisits detected: {revisits_detected}, revisits avoided: {revisits_avoided}, "
+          f"kicks: {kicks}, final tenure: {tabu_tenure}")
+    
+    if stats is not None:
+        stats['revisits_detected'] = revisits_detected
+        stats['revisits_avoided'] = revisits_avoided
+        stats['kicks'] = kicks
+        stats['final_tenure'] = tabu_tenure
+        stats['visited_solutions'] = len(visited)
+    
+    return S_best
+
+if __name__ == "__main__":
+    # Self-check: run the search on the bundled instance with the
+    # incremental hash/cost checks switched on.
+    from data_loader import load_cvrp_instance
+    from initial_solution import create_initial_solution
+    from local_search import local_search_by_swapping
+    
+    CHECK_INCREMENTAL = True
+    depot, customers, m, Q, dist_matrix = load_cvrp_instance('P-n19-k2.vrp')
+    for seed in range(5):
+        random.seed(seed)
+        start = local_search_by_swapping(create_initial_solution(depot, customers, m, Q), 
+                                         Q, dist_matrix)
+        simple_tabu_search(start, Q, dist_matrix, 1000, 3)
+    print("Self-check passed: incremental hash and cost match a full recompute.")
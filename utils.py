@@ -1,4 +1,5 @@
 import math
+import random
 
 # -------------------------------------------
 # --- DATA STRUCTURES
@@ -51,4 +52,31 @@ def calculate_route_demand(route):
     total_demand = 0
     for customer in route:
         total_demand += customer.demand
-    return total_demand
\ No newline at end of file
+    return total_demand
+
+# -------------------------------------------
+# --- SOLUTION HASHING
+# -------------------------------------------
+
+def build_arc_keys(num_nodes, seed=0):
+    """
+    Builds a Zobrist table: one random 64-bit key per directed arc (i, j).
+    The table is indexed like the distance matrix, so it has
+    (num_nodes + 1) x (num_nodes + 1) entries.
+    A fixed seed keeps hashes stable between runs.
+    """
+    rng = random.Random(seed)
+    return [[rng.getrandbits(64) for _ in range(num_nodes + 1)]
+            for _ in range(num_nodes + 1)]
+
+def calculate_solution_hash(solution, arc_keys):
+    """
+    Calculates the hash of a solution by XOR-ing the keys of all its arcs.
+    Route order does not matter, so two solutions made of the same
+    routes get the same hash.
+    """
+    solution_hash = 0
+    for route in solution:
+        for i in range(len(route) - 1):
+            solution_hash ^= arc_keys[route[i].id][route[i+1].id]
+    return solution_hash
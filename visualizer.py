@@ -3,10 +3,12 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import os
 
-def plot_solution(solution, instance_name="CVRP Solution"):
+def plot_solution(solution, instance_name="CVRP Solution", save_path=None):
     """
     Plots the CVRP solution using Matplotlib and saves it to a file.
     Each route will be a different color.
+    By default the file goes to static/<instance>_solution.png;
+    pass save_path to choose another location.
     """
     print("Generating plot...")
     
@@ -50,8 +52,9 @@ def plot_solution(solution, instance_name="CVRP Solution"):
     
     # Create an output filename based on the instance name
     # e.g., "E-n23-k3.vrp" becomes "E-n23-k3_solution.png"
-    base_name = os.path.splitext(os.path.basename(instance_name))[0]
-    save_path = os.path.join(os.path.dirname(__file__), 'static', f"{base_name}_solution.png")
+    if save_path is None:
+        base_name = os.path.splitext(os.path.basename(instance_name))[0]
+        save_path = os.path.join(os.path.dirname(__file__), 'static', f"{base_name}_solution.png")
     
     # Save the figure to a file
     plt.savefig(save_path)